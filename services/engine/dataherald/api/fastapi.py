@@ -5,7 +5,6 @@ import json
 import logging
 import os
 import time
-from queue import Queue
 from typing import List
 
 from bson.objectid import InvalidId, ObjectId
@@ -63,9 +62,11 @@ from dataherald.services.nl_generations import NLGenerationService
 from dataherald.services.prompts import PromptService
 from dataherald.services.sql_generations import (
     EmptySQLGenerationError,
+    SQLGenerationCache,
     SQLGenerationService,
 )
 from dataherald.sql_database.base import (
+    DBConnections,
     SQLDatabase,
     SQLInjectionError,
 )
@@ -89,6 +90,7 @@ from dataherald.types import (
     TableDescriptionRequest,
     UpdateInstruction,
 )
+from dataherald.utils.async_queue import ThreadSafeAsyncQueue
 from dataherald.utils.encrypt import FernetEncrypt
 from dataherald.utils.error_codes import error_response, stream_error_response
 from dataherald.utils.sql_utils import (
@@ -101,13 +103,17 @@ logger = logging.getLogger(__name__)
 MAX_ROWS_TO_CREATE_CSV_FILE = 50
 
 
-def async_scanning(scanner, database, table_descriptions, storage):
-    scanner.scan(
-        database,
-        table_descriptions,
-        TableDescriptionRepository(storage),
-        QueryHistoryRepository(storage),
-    )
+def async_scanning(scanner, database, table_descriptions, storage, db_connection_id):
+    try:
+        scanner.scan(
+            database,
+            table_descriptions,
+            TableDescriptionRepository(storage),
+            QueryHistoryRepository(storage),
+        )
+    finally:
+        # Generations cached while the scan was running used partial descriptions
+        SQLGenerationCache.invalidate(db_connection_id)
 
 
 def async_fine_tuning(system, storage, model):
@@ -163,6 +169,7 @@ class FastAPI(API):
         )
         database_connection_service = DatabaseConnectionService(scanner, self.storage)
         for db_connection_id, schemas_and_table_descriptions in data.items():
+            SQLGenerationCache.invalidate(db_connection_id)
             for schema, table_descriptions in schemas_and_table_descriptions.items():
                 db_connection = db_connection_repository.find_by_id(db_connection_id)
                 database = database_connection_service.get_sql_database(
@@ -170,7 +177,12 @@ class FastAPI(API):
                 )
 
                 background_tasks.add_task(
-                    async_scanning, scanner, database, table_descriptions, self.storage
+                    async_scanning,
+                    scanner,
+                    database,
+                    table_descriptions,
+                    self.storage,
+                    db_connection_id,
                 )
         return [TableDescriptionResponse(**row.dict()) for row in rows]
 
@@ -226,12 +238,14 @@ class FastAPI(API):
                 data[None] = sql_database.get_tables_and_views()
 
             scanner_repository = TableDescriptionRepository(self.storage)
+            table_descriptions = scanner.refresh_tables(
+                data, str(db_connection.id), scanner_repository
+            )
+            SQLGenerationCache.invalidate(str(db_connection.id))
 
             return [
                 TableDescriptionResponse(**record.dict())
-                for record in scanner.refresh_tables(
-                    data, str(db_connection.id), scanner_repository
-                )
+                for record in table_descriptions
             ]
         except Exception as e:
             return error_response(e, refresh_table_description.dict(), "refresh_failed")
@@ -271,6 +285,7 @@ class FastAPI(API):
                 metadata=database_connection_request.metadata,
             )
 
+            DBConnections.invalidate(db_connection_id)
             sql_database = SQLDatabase.get_sql_engine(db_connection, True)
 
             # Get tables and views and create missing table-descriptions as NOT_SCANNED and update DEPRECATED
@@ -280,6 +295,7 @@ class FastAPI(API):
             tables = sql_database.get_tables_and_views()
             db_connection = db_connection_repository.update(db_connection)
             scanner.refresh_tables(tables, str(db_connection.id), scanner_repository)
+            SQLGenerationCache.invalidate(db_connection_id)
         except Exception as e:
             # Encrypt sensible values
             fernet_encrypt = FernetEncrypt()
@@ -319,6 +335,7 @@ class FastAPI(API):
             table_description = scanner_repository.update_fields(
                 table, table_description_request
             )
+            SQLGenerationCache.invalidate(table.db_connection_id)
             return TableDescriptionResponse(**table_description.dict())
         except InvalidColumnNameError as e:
             raise HTTPException(status_code=400, detail=str(e)) from e
@@ -423,6 +440,10 @@ class FastAPI(API):
                 {"items": [row.dict() for row in golden_sqls]},
                 "golden_sql_not_created",
             )
+        for db_connection_id in {
+            golden_sql.db_connection_id for golden_sql in golden_sqls
+        }:
+            SQLGenerationCache.invalidate(db_connection_id)
         return [GoldenSQLResponse(**golden_sql.dict()) for golden_sql in golden_sqls]
 
     @override
@@ -462,7 +483,10 @@ class FastAPI(API):
     @override
     def delete_golden_sql(self, golden_sql_id: str) -> dict:
         context_store = self.system.instance(ContextStore)
+        golden_sql = GoldenSQLRepository(self.storage).find_by_id(golden_sql_id)
         status = context_store.remove_golden_sqls([golden_sql_id])
+        if golden_sql:
+            SQLGenerationCache.invalidate(golden_sql.db_connection_id)
         return {"status": status}
 
     @override
@@ -510,6 +534,7 @@ class FastAPI(API):
                 metadata=instruction_request.metadata,
             )
             instruction = instruction_repository.insert(instruction)
+            SQLGenerationCache.invalidate(instruction.db_connection_id)
         except Exception as e:
             return error_response(
                 e, instruction_request.dict(), "instruction_not_created"
@@ -538,9 +563,11 @@ class FastAPI(API):
     @override
     def delete_instruction(self, instruction_id: str) -> dict:
         instruction_repository = InstructionRepository(self.storage)
+        instruction = instruction_repository.find_by_id(instruction_id)
         deleted = instruction_repository.delete_by_id(instruction_id)
         if deleted == 0:
             raise HTTPException(status_code=404, detail="Instruction not found")
+        SQLGenerationCache.invalidate(instruction.db_connection_id)
         return {"status": "success"}
 
     @override
@@ -560,6 +587,7 @@ class FastAPI(API):
             metadata=instruction_request.metadata,
         )
         instruction_repository.update(updated_instruction)
+        SQLGenerationCache.invalidate(instruction.db_connection_id)
         return InstructionResponse(**updated_instruction.dict())
 
     @override
@@ -894,18 +922,18 @@ class FastAPI(API):
         request: StreamPromptSQLGenerationRequest,
     ):
         try:
-            queue = Queue()
+            queue = ThreadSafeAsyncQueue()
             prompt_service = PromptService(self.storage)
             prompt = prompt_service.create(request.prompt)
             sql_generation_service = SQLGenerationService(self.system, self.storage)
-            sql_generation_service.start_streaming(prompt.id, request, queue)
+            await asyncio.to_thread(
+                sql_generation_service.start_streaming, prompt.id, request, queue
+            )
             while True:
-                value = queue.get()
+                value = await queue.get()
                 if value is None:
                     break
                 yield value
-                queue.task_done()
-                await asyncio.sleep(0.001)
         except Exception as e:
             yield json.dumps(
                 stream_error_response(e, request.dict(), "nl_generation_not_created")
@@ -16,6 +16,7 @@ class SQLGenerationRequest(BaseModel):
     low_latency_mode: bool = False
     llm_config: LLMConfig | None
     evaluate: bool = False
+    use_cache: bool = False
     sql: str | None
     metadata: dict | None
 
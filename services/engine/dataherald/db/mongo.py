@@ -1,6 +1,6 @@
 from bson.objectid import ObjectId
 from overrides import override
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 
 from dataherald.config import System
 from dataherald.db import DB
@@ -37,13 +37,18 @@ class MongoDB(DB):
 
     @override
     def update_or_create(self, collection: str, query: dict, obj: dict) -> int:
-        row = self.find_one(collection, query)
-        if row:
-            if "created_at" in obj:
-                del obj["created_at"]
-            self._data_store[collection].update_one(query, {"$set": obj})
-            return row["_id"]
-        return self.insert_one(collection, obj)
+        # Single round-trip upsert, created_at is only written when inserting
+        update = {"$set": {k: v for k, v in obj.items() if k != "created_at"}}
+        if "created_at" in obj:
+            update["$setOnInsert"] = {"created_at": obj["created_at"]}
+        row = self._data_store[collection].find_one_and_update(
+            query,
+            update,
+            projection={"_id": True},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return row["_id"]
 
     @override
     def find_by_id(self, collection: str, id: str) -> dict:
@@ -1,7 +1,10 @@
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from datetime import datetime
-from queue import Queue
 
 import pandas as pd
 
@@ -17,12 +20,16 @@ from dataherald.repositories.sql_generations import (
     SQLGenerationRepository,
 )
 from dataherald.sql_database.base import SQLDatabase
+from dataherald.sql_database.models.types import DatabaseConnection
+from dataherald.sql_generator import SQLGenerator
 from dataherald.sql_generator.create_sql_query_status import create_sql_query_status
 from dataherald.sql_generator.dataherald_finetuning_agent import (
     DataheraldFinetuningAgent,
 )
 from dataherald.sql_generator.dataherald_sqlagent import DataheraldSQLAgent
-from dataherald.types import LLMConfig, SQLGeneration
+from dataherald.types import LLMConfig, Prompt, SQLGeneration
+from dataherald.utils.async_queue import StepQueue
+from dataherald.utils.strings import remove_whitespace
 
 
 class SQLGenerationError(Exception):
@@ -33,11 +40,70 @@ class EmptySQLGenerationError(Exception):
     pass
 
 
+class SQLGenerationCache:
+    max_size = 256
+    ttl = int(os.environ.get("SQL_GENERATION_CACHE_TTL", "3600"))
+    sql_generations = OrderedDict()
+    lock = threading.Lock()
+
+    @staticmethod
+    def get_key(prompt: Prompt, sql_generation_request: SQLGenerationRequest) -> str:
+        llm_config = sql_generation_request.llm_config or LLMConfig()
+        key = "|".join(
+            [
+                prompt.db_connection_id,
+                remove_whitespace(prompt.text),
+                ",".join(sorted(prompt.schemas or [])),
+                sql_generation_request.finetuning_id or "",
+                str(sql_generation_request.low_latency_mode),
+                llm_config.llm_name,
+                llm_config.api_base or "",
+            ]
+        )
+        return hashlib.sha1(key.encode()).hexdigest()  # noqa: S324
+
+    @staticmethod
+    def get(key: str) -> SQLGeneration | None:
+        with SQLGenerationCache.lock:
+            cached = SQLGenerationCache.sql_generations.get(key)
+            if cached is None:
+                return None
+            expires_at, _, sql_generation = cached
+            if expires_at < time.monotonic():
+                del SQLGenerationCache.sql_generations[key]
+                return None
+            SQLGenerationCache.sql_generations.move_to_end(key)
+            return sql_generation.copy(deep=True)
+
+    @staticmethod
+    def add(key: str, db_connection_id: str, sql_generation: SQLGeneration):
+        with SQLGenerationCache.lock:
+            SQLGenerationCache.sql_generations[key] = (
+                time.monotonic() + SQLGenerationCache.ttl,
+                db_connection_id,
+                sql_generation.copy(deep=True),
+            )
+            SQLGenerationCache.sql_generations.move_to_end(key)
+            while len(SQLGenerationCache.sql_generations) > SQLGenerationCache.max_size:
+                SQLGenerationCache.sql_generations.popitem(last=False)
+
+    @staticmethod
+    def invalidate(db_connection_id: str):
+        with SQLGenerationCache.lock:
+            for key, (_, cached_db_connection_id, _) in list(
+                SQLGenerationCache.sql_generations.items()
+            ):
+                if cached_db_connection_id == db_connection_id:
+                    del SQLGenerationCache.sql_generations[key]
+
+
 class SQLGenerationService:
     def __init__(self, system: System, storage):
         self.system = system
         self.storage = storage
         self.sql_generation_repository = SQLGenerationRepository(storage)
+        self.prompt_repository = PromptRepository(storage)
+        self.db_connection_repository = DatabaseConnectionRepository(storage)
 
     def update_error(self, sql_generation: SQLGeneration, error: str) -> SQLGeneration:
         sql_generation.error = error
@@ -63,9 +129,16 @@ class SQLGenerationService:
         initial_sql_generation.intermediate_steps = sql_generation.intermediate_steps
         return self.sql_generation_repository.update(initial_sql_generation)
 
-    def create(  # noqa: PLR0912
+    def get_langsmith_metadata(self, sql_generation_request) -> dict:
+        return (
+            sql_generation_request.metadata.get("lang_smith", {})
+            if sql_generation_request.metadata
+            else {}
+        )
+
+    def initialize_sql_generation(
         self, prompt_id: str, sql_generation_request: SQLGenerationRequest
-    ) -> SQLGeneration:  # noqa: PLR0912
+    ) -> tuple[SQLGeneration, Prompt, DatabaseConnection, SQLDatabase]:
         initial_sql_generation = SQLGeneration(
             prompt_id=prompt_id,
             created_at=datetime.now(),
@@ -74,68 +147,155 @@ class SQLGenerationService:
             else LLMConfig(),
             metadata=sql_generation_request.metadata,
         )
-        langsmith_metadata = (
-            sql_generation_request.metadata.get("lang_smith", {})
-            if sql_generation_request.metadata
-            else {}
-        )
-        self.sql_generation_repository.insert(initial_sql_generation)
-        prompt_repository = PromptRepository(self.storage)
-        prompt = prompt_repository.find_by_id(prompt_id)
+        # Set here rather than in get_sql_generator, which cache hits skip
+        if sql_generation_request.finetuning_id:
+            initial_sql_generation.finetuning_id = sql_generation_request.finetuning_id
+            initial_sql_generation.low_latency_mode = (
+                sql_generation_request.low_latency_mode
+            )
+        # The initial insert has no data dependency on the lookups, so overlap them
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            insert_future = executor.submit(
+                self.sql_generation_repository.insert, initial_sql_generation
+            )
+            prompt = self.prompt_repository.find_by_id(prompt_id)
+            if prompt:
+                db_connection = self.db_connection_repository.find_by_id(
+                    prompt.db_connection_id
+                )
+                database = SQLDatabase.get_sql_engine(db_connection)
+            insert_future.result()
         if not prompt:
             self.update_error(initial_sql_generation, f"Prompt {prompt_id} not found")
             raise PromptNotFoundError(
                 f"Prompt {prompt_id} not found", initial_sql_generation.id
             )
-        db_connection_repository = DatabaseConnectionRepository(self.storage)
-        db_connection = db_connection_repository.find_by_id(prompt.db_connection_id)
-        database = SQLDatabase.get_sql_engine(db_connection, True)
-        if sql_generation_request.sql is not None:
-            sql_generation = SQLGeneration(
-                prompt_id=prompt_id,
-                sql=sql_generation_request.sql,
-                tokens_used=0,
+        return initial_sql_generation, prompt, db_connection, database
+
+    def create_sql_generation_from_sql(
+        self, initial_sql_generation: SQLGeneration, sql: str, database: SQLDatabase
+    ) -> SQLGeneration:
+        sql_generation = SQLGeneration(
+            prompt_id=initial_sql_generation.prompt_id,
+            sql=sql,
+            tokens_used=0,
+        )
+        try:
+            return create_sql_query_status(
+                db=database, query=sql_generation.sql, sql_generation=sql_generation
             )
-            try:
-                sql_generation = create_sql_query_status(
-                    db=database, query=sql_generation.sql, sql_generation=sql_generation
+        except Exception as e:
+            self.update_error(initial_sql_generation, str(e))
+            raise SQLGenerationError(str(e), initial_sql_generation.id) from e
+
+    def get_cached_sql_generation(
+        self, prompt: Prompt, sql_generation_request: SQLGenerationRequest
+    ) -> SQLGeneration | None:
+        if not sql_generation_request.use_cache:
+            return None
+        sql_generation = SQLGenerationCache.get(
+            SQLGenerationCache.get_key(prompt, sql_generation_request)
+        )
+        if sql_generation:
+            # No LLM call was made for this generation
+            sql_generation.tokens_used = 0
+        return sql_generation
+
+    def cache_sql_generation(
+        self,
+        prompt: Prompt,
+        sql_generation_request: SQLGenerationRequest,
+        sql_generation: SQLGeneration,
+    ):
+        if sql_generation.status == "VALID" and not sql_generation.error:
+            SQLGenerationCache.add(
+                SQLGenerationCache.get_key(prompt, sql_generation_request),
+                prompt.db_connection_id,
+                sql_generation,
+            )
+
+    def get_sql_generator(
+        self,
+        sql_generation_request: SQLGenerationRequest,
+        initial_sql_generation: SQLGeneration,
+    ) -> SQLGenerator:
+        if (
+            sql_generation_request.finetuning_id is None
+            or sql_generation_request.finetuning_id == ""
+        ):
+            if sql_generation_request.low_latency_mode:
+                raise SQLGenerationError(
+                    "Low latency mode is not supported for our old agent with no finetuning. Please specify a finetuning id.",
+                    initial_sql_generation.id,
                 )
-            except Exception as e:
-                self.update_error(initial_sql_generation, str(e))
-                raise SQLGenerationError(str(e), initial_sql_generation.id) from e
+            return DataheraldSQLAgent(
+                self.system,
+                sql_generation_request.llm_config
+                if sql_generation_request.llm_config
+                else LLMConfig(),
+            )
+        sql_generator = DataheraldFinetuningAgent(
+            self.system,
+            sql_generation_request.llm_config
+            if sql_generation_request.llm_config
+            else LLMConfig(),
+        )
+        sql_generator.finetuning_id = sql_generation_request.finetuning_id
+        sql_generator.use_fintuned_model_only = sql_generation_request.low_latency_mode
+        initial_sql_generation.finetuning_id = sql_generation_request.finetuning_id
+        initial_sql_generation.low_latency_mode = (
+            sql_generation_request.low_latency_mode
+        )
+        return sql_generator
+
+    def complete_sql_generation(
+        self,
+        initial_sql_generation: SQLGeneration,
+        sql_generation: SQLGeneration,
+        sql_generation_request: SQLGenerationRequest,
+        prompt: Prompt,
+        db_connection: DatabaseConnection,
+    ) -> SQLGeneration:
+        # User supplied SQL is only validated, scoring it would cost an extra LLM call
+        if sql_generation_request.evaluate and sql_generation_request.sql is None:
+            evaluator = self.system.instance(Evaluator)
+            evaluator.llm_config = (
+                sql_generation_request.llm_config
+                if sql_generation_request.llm_config
+                else LLMConfig()
+            )
+            confidence_score = evaluator.get_confidence_score(
+                user_prompt=prompt,
+                sql_generation=sql_generation,
+                database_connection=db_connection,
+            )
+            initial_sql_generation.evaluate = sql_generation_request.evaluate
+            initial_sql_generation.confidence_score = confidence_score
+        return self.update_the_initial_sql_generation(
+            initial_sql_generation, sql_generation
+        )
+
+    def create(
+        self, prompt_id: str, sql_generation_request: SQLGenerationRequest
+    ) -> SQLGeneration:
+        (
+            initial_sql_generation,
+            prompt,
+            db_connection,
+            database,
+        ) = self.initialize_sql_generation(prompt_id, sql_generation_request)
+        if sql_generation_request.sql is not None:
+            sql_generation = self.create_sql_generation_from_sql(
+                initial_sql_generation, sql_generation_request.sql, database
+            )
+        elif cached_sql_generation := self.get_cached_sql_generation(
+            prompt, sql_generation_request
+        ):
+            sql_generation = cached_sql_generation
         else:
-            if (
-                sql_generation_request.finetuning_id is None
-                or sql_generation_request.finetuning_id == ""
-            ):
-                if sql_generation_request.low_latency_mode:
-                    raise SQLGenerationError(
-                        "Low latency mode is not supported for our old agent with no finetuning. Please specify a finetuning id.",
-                        initial_sql_generation.id,
-                    )
-                sql_generator = DataheraldSQLAgent(
-                    self.system,
-                    sql_generation_request.llm_config
-                    if sql_generation_request.llm_config
-                    else LLMConfig(),
-                )
-            else:
-                sql_generator = DataheraldFinetuningAgent(
-                    self.system,
-                    sql_generation_request.llm_config
-                    if sql_generation_request.llm_config
-                    else LLMConfig(),
-                )
-                sql_generator.finetuning_id = sql_generation_request.finetuning_id
-                sql_generator.use_fintuned_model_only = (
-                    sql_generation_request.low_latency_mode
-                )
-                initial_sql_generation.finetuning_id = (
-                    sql_generation_request.finetuning_id
-                )
-                initial_sql_generation.low_latency_mode = (
-                    sql_generation_request.low_latency_mode
-                )
+            sql_generator = self.get_sql_generator(
+                sql_generation_request, initial_sql_generation
+            )
             try:
                 with ThreadPoolExecutor(max_workers=1) as executor:
                     future = executor.submit(
@@ -143,11 +303,11 @@ class SQLGenerationService:
                         sql_generator,
                         prompt,
                         db_connection,
-                        metadata=langsmith_metadata,
+                        metadata=self.get_langsmith_metadata(sql_generation_request),
                     )
                     try:
                         sql_generation = future.result(
-                            timeout=int(os.environ.get("DH_ENGINE_TIMEOUT", 150))
+                            timeout=int(os.environ.get("DH_ENGINE_TIMEOUT", "150"))
                         )
                     except TimeoutError as e:
                         self.update_error(
@@ -160,26 +320,20 @@ class SQLGenerationService:
             except Exception as e:
                 self.update_error(initial_sql_generation, str(e))
                 raise SQLGenerationError(str(e), initial_sql_generation.id) from e
-        if sql_generation_request.evaluate:
-            evaluator = self.system.instance(Evaluator)
-            evaluator.llm_config = (
-                sql_generation_request.llm_config
-                if sql_generation_request.llm_config
-                else LLMConfig()
-            )
-            confidence_score = evaluator.get_confidence_score(
-                user_prompt=prompt,
-                sql_generation=sql_generation,
-                database_connection=db_connection,
-            )
-            initial_sql_generation.evaluate = sql_generation_request.evaluate
-            initial_sql_generation.confidence_score = confidence_score
-        return self.update_the_initial_sql_generation(
-            initial_sql_generation, sql_generation
+            self.cache_sql_generation(prompt, sql_generation_request, sql_generation)
+        return self.complete_sql_generation(
+            initial_sql_generation,
+            sql_generation,
+            sql_generation_request,
+            prompt,
+            db_connection,
         )
 
     def start_streaming(
-        self, prompt_id: str, sql_generation_request: SQLGenerationRequest, queue: Queue
+        self,
+        prompt_id: str,
+        sql_generation_request: SQLGenerationRequest,
+        queue: StepQueue,
     ):
         initial_sql_generation = SQLGeneration(
             prompt_id=prompt_id,
@@ -189,58 +343,26 @@ class SQLGenerationService:
             else LLMConfig(),
             metadata=sql_generation_request.metadata,
         )
-        langsmith_metadata = (
-            sql_generation_request.metadata.get("lang_smith", {})
-            if sql_generation_request.metadata
-            else {}
-        )
         self.sql_generation_repository.insert(initial_sql_generation)
-        prompt_repository = PromptRepository(self.storage)
-        prompt = prompt_repository.find_by_id(prompt_id)
+        prompt = self.prompt_repository.find_by_id(prompt_id)
         if not prompt:
             self.update_error(initial_sql_generation, f"Prompt {prompt_id} not found")
             raise PromptNotFoundError(
                 f"Prompt {prompt_id} not found", initial_sql_generation.id
             )
-        db_connection_repository = DatabaseConnectionRepository(self.storage)
-        db_connection = db_connection_repository.find_by_id(prompt.db_connection_id)
-        if (
-            sql_generation_request.finetuning_id is None
-            or sql_generation_request.finetuning_id == ""
-        ):
-            if sql_generation_request.low_latency_mode:
-                raise SQLGenerationError(
-                    "Low latency mode is not supported for our old agent with no finetuning. Please specify a finetuning id.",
-                    initial_sql_generation.id,
-                )
-            sql_generator = DataheraldSQLAgent(
-                self.system,
-                sql_generation_request.llm_config
-                if sql_generation_request.llm_config
-                else LLMConfig(),
-            )
-        else:
-            sql_generator = DataheraldFinetuningAgent(
-                self.system,
-                sql_generation_request.llm_config
-                if sql_generation_request.llm_config
-                else LLMConfig(),
-            )
-            sql_generator.finetuning_id = sql_generation_request.finetuning_id
-            sql_generator.use_fintuned_model_only = (
-                sql_generation_request.low_latency_mode
-            )
-            initial_sql_generation.finetuning_id = sql_generation_request.finetuning_id
-            initial_sql_generation.low_latency_mode = (
-                sql_generation_request.low_latency_mode
-            )
+        db_connection = self.db_connection_repository.find_by_id(
+            prompt.db_connection_id
+        )
+        sql_generator = self.get_sql_generator(
+            sql_generation_request, initial_sql_generation
+        )
         try:
             sql_generator.stream_response(
                 user_prompt=prompt,
                 database_connection=db_connection,
                 response=initial_sql_generation,
                 queue=queue,
-                metadata=langsmith_metadata,
+                metadata=self.get_langsmith_metadata(sql_generation_request),
             )
         except Exception as e:
             self.update_error(initial_sql_generation, str(e))
@@ -255,11 +377,11 @@ class SQLGenerationService:
             raise SQLGenerationNotFoundError(
                 f"SQL Generation {sql_generation_id} not found"
             )
-        prompt_repository = PromptRepository(self.storage)
-        prompt = prompt_repository.find_by_id(sql_generation.prompt_id)
-        db_connection_repository = DatabaseConnectionRepository(self.storage)
-        db_connection = db_connection_repository.find_by_id(prompt.db_connection_id)
-        database = SQLDatabase.get_sql_engine(db_connection, True)
+        prompt = self.prompt_repository.find_by_id(sql_generation.prompt_id)
+        db_connection = self.db_connection_repository.find_by_id(
+            prompt.db_connection_id
+        )
+        database = SQLDatabase.get_sql_engine(db_connection)
         return database.run_sql(sql_generation.sql, max_rows)
 
     def update_metadata(self, sql_generation_id, metadata_request) -> SQLGeneration:
@@ -277,10 +399,10 @@ class SQLGenerationService:
             raise SQLGenerationNotFoundError(
                 f"Sql generation {sql_generation_id} not found"
             )
-        prompt_repository = PromptRepository(self.storage)
-        prompt = prompt_repository.find_by_id(sql_generation.prompt_id)
-        db_connection_repository = DatabaseConnectionRepository(self.storage)
-        db_connection = db_connection_repository.find_by_id(prompt.db_connection_id)
+        prompt = self.prompt_repository.find_by_id(sql_generation.prompt_id)
+        db_connection = self.db_connection_repository.find_by_id(
+            prompt.db_connection_id
+        )
         database = SQLDatabase.get_sql_engine(db_connection)
         results = database.run_sql(sql_generation.sql)
         if results is None:
@@ -1,6 +1,8 @@
 """SQL wrapper around SQLDatabase in langchain."""
 import logging
 import re
+import threading
+from collections import OrderedDict
 from typing import List
 from urllib.parse import unquote
 
@@ -36,11 +38,46 @@ class SSHInvalidDatabaseConnectionError(CustomError):
 
 
 class DBConnections:
-    db_connections = {}
+    max_size = 32
+    db_connections = OrderedDict()
+    lock = threading.Lock()
+
+    @staticmethod
+    def get_key(uri, schema: str | None = None) -> str:
+        # Engines pointed at a single schema must not be served for the default lookup
+        return f"{uri}:{schema}" if schema else uri
 
     @staticmethod
     def add(uri, engine):
-        DBConnections.db_connections[uri] = engine
+        # A refreshed engine replaces the cached one without disposing it, since
+        # concurrent requests may still be using its pool
+        evicted = []
+        with DBConnections.lock:
+            DBConnections.db_connections[uri] = engine
+            DBConnections.db_connections.move_to_end(uri)
+            while len(DBConnections.db_connections) > DBConnections.max_size:
+                evicted.append(DBConnections.db_connections.popitem(last=False)[1])
+        for sql_database in evicted:
+            sql_database.engine.dispose()
+
+    @staticmethod
+    def get(uri) -> "SQLDatabase | None":
+        with DBConnections.lock:
+            sql_database = DBConnections.db_connections.get(uri)
+            if sql_database is not None:
+                DBConnections.db_connections.move_to_end(uri)
+            return sql_database
+
+    @staticmethod
+    def invalidate(uri):
+        with DBConnections.lock:
+            sql_databases = [
+                DBConnections.db_connections.pop(key)
+                for key in list(DBConnections.db_connections)
+                if key == uri or str(key).startswith(f"{uri}:")
+            ]
+        for sql_database in sql_databases:
+            sql_database.engine.dispose()
 
 
 class SQLDatabase:
@@ -67,18 +104,19 @@ class SQLDatabase:
 
     @classmethod
     def get_sql_engine(
-        cls, database_info: DatabaseConnection, refresh_connection=False
+        cls,
+        database_info: DatabaseConnection,
+        refresh_connection=False,
+        schema: str | None = None,
     ) -> "SQLDatabase":
         logger.info(f"Connecting db: {database_info.id}")
+        key = DBConnections.get_key(database_info.id, schema)
         try:
-            if (
-                database_info.id
-                and database_info.id in DBConnections.db_connections
-                and not refresh_connection
-            ):
-                sql_database = DBConnections.db_connections[database_info.id]
-                sql_database.engine.connect()
-                return sql_database
+            if database_info.id and not refresh_connection:
+                sql_database = DBConnections.get(key)
+                if sql_database is not None:
+                    sql_database.engine.connect()
+                    return sql_database
         except OperationalError:
             pass
 
@@ -86,7 +124,7 @@ class SQLDatabase:
         try:
             if database_info.use_ssh:
                 engine = cls.from_uri_ssh(database_info)
-                DBConnections.add(database_info.id, engine)
+                DBConnections.add(key, engine)
                 return engine
         except Exception as e:
             raise SSHInvalidDatabaseConnectionError(
@@ -105,7 +143,7 @@ class SQLDatabase:
 
             engine = cls.from_uri(db_uri)
             engine.engine.connect()
-            DBConnections.add(database_info.id, engine)
+            DBConnections.add(key, engine)
         except Exception as e:
             raise InvalidDBConnectionError(  # noqa: B904
                 f"Unable to connect to db: {database_info.alias}", description=str(e)
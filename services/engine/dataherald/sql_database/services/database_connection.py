@@ -34,7 +34,7 @@ class DatabaseConnectionService:
                     database_connection.dialect.value,
                 )
             )
-        return SQLDatabase.get_sql_engine(database_connection, True)
+        return SQLDatabase.get_sql_engine(database_connection, True, schema)
 
     def get_current_schema(
         self, database_connection: DatabaseConnection
@@ -130,7 +130,9 @@ class DatabaseConnectionService:
                         str(database_connection.dialect),
                     )
                 )
-                sql_database = SQLDatabase.get_sql_engine(database_connection, True)
+                sql_database = SQLDatabase.get_sql_engine(
+                    database_connection, True, schema
+                )
                 schemas_and_tables[schema] = sql_database.get_tables_and_views()
         else:
             sql_database = SQLDatabase.get_sql_engine(database_connection, True)
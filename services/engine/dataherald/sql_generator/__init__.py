@@ -4,7 +4,6 @@ import logging
 import os
 import re
 from abc import ABC, abstractmethod
-from queue import Queue
 from typing import Any, Dict, List, Tuple
 
 import sqlparse
@@ -23,7 +22,10 @@ from dataherald.sql_database.base import SQLDatabase, SQLInjectionError
 from dataherald.sql_database.models.types import DatabaseConnection
 from dataherald.sql_generator.create_sql_query_status import create_sql_query_status
 from dataherald.types import IntermediateStep, LLMConfig, Prompt, SQLGeneration
-from dataherald.utils.strings import contains_line_breaks
+from dataherald.utils.async_queue import StepQueue
+
+MARKDOWN_SQL_PATTERN = re.compile(r"```sql(.*?)```", re.DOTALL)
+SQL_COMMENT_PATTERN = re.compile(r"--.*$", re.MULTILINE)
 
 
 class EngineTimeOutORItemLimitError(Exception):
@@ -56,8 +58,7 @@ class SQLGenerator(Component, ABC):
         return response
 
     def remove_markdown(self, query: str) -> str:
-        pattern = r"```sql(.*?)```"
-        matches = re.findall(pattern, query, re.DOTALL)
+        matches = MARKDOWN_SQL_PATTERN.findall(query)
         if matches:
             return matches[0].strip()
         return query
@@ -74,25 +75,21 @@ class SQLGenerator(Component, ABC):
         db_scan: List[TableDescription], prompt: Prompt
     ) -> List[TableDescription]:
         if prompt.schemas:
-            return [table for table in db_scan if table.schema_name in prompt.schemas]
+            schemas = set(prompt.schemas)
+            return [table for table in db_scan if table.schema_name in schemas]
         return db_scan
 
     def format_sql_query_intermediate_steps(self, step: str) -> str:
-        pattern = r"```sql(.*?)```"
-
         def formatter(match):
             original_sql = match.group(1)
             formatted_sql = self.format_sql_query(original_sql)
             return "```sql\n" + formatted_sql + "\n```"
 
-        return re.sub(pattern, formatter, step, flags=re.DOTALL)
+        return MARKDOWN_SQL_PATTERN.sub(formatter, step)
 
     @classmethod
     def get_upper_bound_limit(cls) -> int:
-        top_k = os.getenv("UPPER_LIMIT_QUERY_RETURN_ROWS", None)
-        if top_k is None or top_k == "":
-            top_k = 50
-        return top_k if isinstance(top_k, int) else int(top_k)
+        return int(os.getenv("UPPER_LIMIT_QUERY_RETURN_ROWS") or 50)
 
     def create_sql_query_status(
         self, db: SQLDatabase, query: str, sql_generation: SQLGeneration
@@ -100,12 +97,14 @@ class SQLGenerator(Component, ABC):
         return create_sql_query_status(db, query, sql_generation)
 
     def format_sql_query(self, sql_query: str) -> str:
-        comments = [
-            match.group() for match in re.finditer(r"--.*$", sql_query, re.MULTILINE)
-        ]
-        sql_query_without_comments = re.sub(r"--.*$", "", sql_query, flags=re.MULTILINE)
-
-        if contains_line_breaks(sql_query_without_comments.strip()):
+        if "--" in sql_query:
+            comments = SQL_COMMENT_PATTERN.findall(sql_query)
+            sql_query_without_comments = SQL_COMMENT_PATTERN.sub("", sql_query)
+        else:
+            comments = []
+            sql_query_without_comments = sql_query
+
+        if "\n" in sql_query_without_comments.strip():
             return sql_query
 
         parsed = sqlparse.format(sql_query_without_comments, reindent=True)
@@ -117,47 +116,40 @@ class SQLGenerator(Component, ABC):
     ) -> str:
         """Extract the SQL query from the intermediate steps."""
         sql_query = ""
+        thought_sql_query = ""
         for step in intermediate_steps:
             action = step[0]
             if type(action) == AgentAction and action.tool == "SqlDbQuery":
-                if "SELECT" in self.format_sql_query(action.tool_input).upper():
+                if "SELECT" in action.tool_input.upper():
                     sql_query = self.remove_markdown(action.tool_input)
-        if sql_query == "":
-            for step in intermediate_steps:
-                thought = str(step[0].log).split("Action:")[0]
+            if sql_query == "":
+                thought = action.log.partition("Action:")[0]
                 if "```sql" in thought:
-                    sql_query = self.remove_markdown(thought)
-                    if not sql_query.upper().strip().startswith("SELECT"):
-                        sql_query = ""
-        return sql_query
+                    thought_sql_query = self.remove_markdown(thought)
+                    if not thought_sql_query.upper().strip().startswith("SELECT"):
+                        thought_sql_query = ""
+        return sql_query or thought_sql_query
 
     def construct_intermediate_steps(
         self, intermediate_steps: List[Tuple[AgentAction, str]], suffix: str = ""
     ) -> List[IntermediateStep]:
         """Constructs the intermediate steps."""
+        first_thought = suffix.split("Thought: ")[1].split("{agent_scratchpad}")[0]
         formatted_intermediate_steps = []
-        for step in intermediate_steps:
-            if step[0].tool == "SqlDbQuery":
-                formatted_intermediate_steps.append(
-                    IntermediateStep(
-                        thought=str(step[0].log).split("Action:")[0],
-                        action=step[0].tool,
-                        action_input=step[0].tool_input,
-                        observation="QUERY RESULTS ARE NOT STORED FOR PRIVACY REASONS.",
-                    )
-                )
-            else:
-                formatted_intermediate_steps.append(
-                    IntermediateStep(
-                        thought=str(step[0].log).split("Action:")[0],
-                        action=step[0].tool,
-                        action_input=step[0].tool_input,
-                        observation=self.truncate_observations(step[1]),
-                    )
+        for index, (action, observation) in enumerate(intermediate_steps):
+            # All fields are already strings, so skip pydantic validation
+            formatted_intermediate_steps.append(
+                IntermediateStep.construct(
+                    thought=first_thought
+                    if index == 0
+                    else action.log.partition("Action:")[0],
+                    action=action.tool,
+                    action_input=action.tool_input,
+                    observation="QUERY RESULTS ARE NOT STORED FOR PRIVACY REASONS."
+                    if action.tool == "SqlDbQuery"
+                    else self.truncate_observations(observation),
                 )
-        formatted_intermediate_steps[0].thought = suffix.split("Thought: ")[1].split(
-            "{agent_scratchpad}"
-        )[0]
+            )
         return formatted_intermediate_steps
 
     def truncate_observations(self, obervarion: str, max_length: int = 2000) -> str:
@@ -185,7 +177,7 @@ class SQLGenerator(Component, ABC):
         agent_executor: AgentExecutor,
         response: SQLGeneration,
         sql_generation_repository: SQLGenerationRepository,
-        queue: Queue,
+        queue: StepQueue,
         metadata: dict = None,
     ):  # noqa: PLR0912
         try:
@@ -193,19 +185,24 @@ class SQLGenerator(Component, ABC):
                 for chunk in agent_executor.stream(
                     {"input": question}, {"metadata": metadata}
                 ):
+                    # Coalesce each chunk into a single put to limit queue lock churn
                     if "actions" in chunk:
-                        for message in chunk["messages"]:
-                            queue.put(
+                        queue.put(
+                            "".join(
                                 self.format_sql_query_intermediate_steps(
                                     message.content
                                 )
                                 + "\n"
+                                for message in chunk["messages"]
                             )
+                        )
                     elif "steps" in chunk:
-                        for step in chunk["steps"]:
-                            queue.put(
+                        queue.put(
+                            "".join(
                                 f"\n**Observation:**\n {self.format_sql_query_intermediate_steps(step.observation)}\n"
+                                for step in chunk["steps"]
                             )
+                        )
                     elif "output" in chunk:
                         queue.put(
                             f'\n**Final Answer:**\n {self.format_sql_query_intermediate_steps(chunk["output"])}'
@@ -221,9 +218,9 @@ class SQLGenerator(Component, ABC):
         except EngineTimeOutORItemLimitError as e:
             raise EngineTimeOutORItemLimitError(e) from e
         except Exception as e:
-            response.sql = ("",)
-            response.status = ("INVALID",)
-            response.error = (str(e),)
+            response.sql = ""
+            response.status = "INVALID"
+            response.error = str(e)
         finally:
             queue.put(None)
             response.tokens_used = cb.total_tokens
@@ -246,7 +243,7 @@ class SQLGenerator(Component, ABC):
         user_prompt: Prompt,
         database_connection: DatabaseConnection,
         response: SQLGeneration,
-        queue: Queue,
+        queue: StepQueue,
         metadata: dict = None,
     ):
         """Streams a response to a user question."""
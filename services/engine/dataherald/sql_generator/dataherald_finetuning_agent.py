@@ -2,7 +2,6 @@ import datetime
 import logging
 import os
 from functools import wraps
-from queue import Queue
 from threading import Thread
 from typing import Any, Callable, Dict, List, Type
 
@@ -25,7 +24,6 @@ from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
 from openai import OpenAI
 from overrides import override
 from pydantic import BaseModel, Field
-from sql_metadata import Parser
 from sqlalchemy.exc import SQLAlchemyError
 
 from dataherald.context_store import ContextStore
@@ -51,7 +49,9 @@ from dataherald.utils.agent_prompts import (
     FINETUNING_SYSTEM_INFORMATION,
     FORMAT_INSTRUCTIONS,
 )
+from dataherald.utils.async_queue import StepQueue
 from dataherald.utils.models_context_window import OPENAI_FINETUNING_MODELS_WINDOW_SIZES
+from dataherald.utils.sql_utils import parse_tables
 from dataherald.utils.timeout_utils import run_with_timeout
 
 logger = logging.getLogger(__name__)
@@ -185,18 +185,21 @@ class TablesSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
     def similar_tables_based_on_few_shot_examples(self, df: pd.DataFrame) -> List[str]:
         most_similar_tables = set()
         if self.few_shot_examples is not None:
+            schemas_by_table = {}
+            for row in df.itertuples():
+                schemas_by_table.setdefault(row.table_name, []).append(row.schema_name)
             for example in self.few_shot_examples:
                 try:
-                    tables = Parser(example["sql"]).tables
+                    tables = parse_tables(example["sql"])
                 except Exception as e:
                     logger.error(f"Error parsing SQL: {str(e)}")
+                    continue
                 for table in tables:
-                    found_tables = df[df.table_name == table]
-                    for _, row in found_tables.iterrows():
-                        most_similar_tables.add((row["schema_name"], row["table_name"]))
+                    for schema_name in schemas_by_table.get(table, []):
+                        most_similar_tables.add((schema_name, table))
             df.drop(
                 df[
-                    df.table_name.isin([table[1] for table in most_similar_tables])
+                    df.table_name.isin({table[1] for table in most_similar_tables})
                 ].index,
                 inplace=True,
             )
@@ -670,7 +673,7 @@ class DataheraldFinetuningAgent(SQLGenerator):
         user_prompt: Prompt,
         database_connection: DatabaseConnection,
         response: SQLGeneration,
-        queue: Queue,
+        queue: StepQueue,
         metadata: dict = None,
     ):
         context_store = self.system.instance(ContextStore)
@@ -3,7 +3,6 @@ import difflib
 import logging
 import os
 from functools import wraps
-from queue import Queue
 from threading import Thread
 from typing import Any, Callable, Dict, List
 
@@ -25,7 +24,6 @@ from langchain_community.callbacks import get_openai_callback
 from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
 from overrides import override
 from pydantic import BaseModel, Field
-from sql_metadata import Parser
 from sqlalchemy.exc import SQLAlchemyError
 
 from dataherald.context_store import ContextStore
@@ -52,6 +50,8 @@ from dataherald.utils.agent_prompts import (
     SUFFIX_WITH_FEW_SHOT_SAMPLES,
     SUFFIX_WITHOUT_FEW_SHOT_SAMPLES,
 )
+from dataherald.utils.async_queue import StepQueue
+from dataherald.utils.sql_utils import parse_tables
 from dataherald.utils.timeout_utils import run_with_timeout
 
 logger = logging.getLogger(__name__)
@@ -246,18 +246,21 @@ class TablesSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
     def similar_tables_based_on_few_shot_examples(self, df: pd.DataFrame) -> List[str]:
         most_similar_tables = set()
         if self.few_shot_examples is not None:
+            schemas_by_table = {}
+            for row in df.itertuples():
+                schemas_by_table.setdefault(row.table_name, []).append(row.schema_name)
             for example in self.few_shot_examples:
                 try:
-                    tables = Parser(example["sql"]).tables
+                    tables = parse_tables(example["sql"])
                 except Exception as e:
                     logger.error(f"Error parsing SQL: {str(e)}")
+                    continue
                 for table in tables:
-                    found_tables = df[df.table_name == table]
-                    for _, row in found_tables.iterrows():
-                        most_similar_tables.add((row["schema_name"], row["table_name"]))
+                    for schema_name in schemas_by_table.get(table, []):
+                        most_similar_tables.add((schema_name, table))
             df.drop(
                 df[
-                    df.table_name.isin([table[1] for table in most_similar_tables])
+                    df.table_name.isin({table[1] for table in most_similar_tables})
                 ].index,
                 inplace=True,
             )
@@ -637,13 +640,10 @@ class DataheraldSQLAgent(SQLGenerator):
     llm: Any = None
 
     def remove_duplicate_examples(self, fewshot_exmaples: List[dict]) -> List[dict]:
-        returned_result = []
-        seen_list = []
+        unique_examples = {}
         for example in fewshot_exmaples:
-            if example["prompt_text"] not in seen_list:
-                seen_list.append(example["prompt_text"])
-                returned_result.append(example)
-        return returned_result
+            unique_examples.setdefault(example["prompt_text"], example)
+        return list(unique_examples.values())
 
     def create_sql_agent(
         self,
@@ -838,7 +838,7 @@ class DataheraldSQLAgent(SQLGenerator):
         user_prompt: Prompt,
         database_connection: DatabaseConnection,
         response: SQLGeneration,
-        queue: Queue,
+        queue: StepQueue,
         metadata: dict = None,
     ):
         context_store = self.system.instance(ContextStore)
@@ -0,0 +1,21 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from dataherald.db.mongo import MongoDB
+
+
+def test_update_or_create_does_not_mutate_obj():
+    mongo = MongoDB.__new__(MongoDB)
+    collection = MagicMock()
+    collection.find_one_and_update.return_value = {"_id": "foo"}
+    mongo._data_store = {"table_descriptions": collection}
+    created_at = datetime.now()
+    obj = {"table_name": "foo", "created_at": created_at}
+
+    assert mongo.update_or_create("table_descriptions", {}, obj) == "foo"
+    assert obj == {"table_name": "foo", "created_at": created_at}
+    update = collection.find_one_and_update.call_args.args[1]
+    assert update == {
+        "$set": {"table_name": "foo"},
+        "$setOnInsert": {"created_at": created_at},
+    }
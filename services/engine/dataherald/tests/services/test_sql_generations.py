@@ -0,0 +1,132 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from dataherald.api.types.requests import SQLGenerationRequest
+from dataherald.services import sql_generations
+from dataherald.services.sql_generations import (
+    SQLGenerationCache,
+    SQLGenerationService,
+)
+from dataherald.types import Prompt, SQLGeneration
+
+
+@pytest.fixture
+def sql_generation_cache():
+    SQLGenerationCache.sql_generations.clear()
+    yield SQLGenerationCache
+    SQLGenerationCache.sql_generations.clear()
+
+
+def cache_service() -> SQLGenerationService:
+    return SQLGenerationService.__new__(SQLGenerationService)
+
+
+@pytest.mark.usefixtures("sql_generation_cache")
+def test_cache_hit_and_miss():
+    service = cache_service()
+    prompt = Prompt(text="Foo", db_connection_id="db-connection")
+    request = SQLGenerationRequest(use_cache=True)
+    assert service.get_cached_sql_generation(prompt, request) is None
+    service.cache_sql_generation(
+        prompt,
+        request,
+        SQLGeneration(
+            prompt_id="prompt", sql="SELECT 1", status="VALID", tokens_used=10
+        ),
+    )
+    sql_generation = service.get_cached_sql_generation(prompt, request)
+    assert sql_generation.sql == "SELECT 1"
+    assert sql_generation.tokens_used == 0
+    assert (
+        service.get_cached_sql_generation(prompt, SQLGenerationRequest(use_cache=False))
+        is None
+    )
+    other_prompt = Prompt(text="Bar", db_connection_id="db-connection")
+    assert service.get_cached_sql_generation(other_prompt, request) is None
+
+
+@pytest.mark.usefixtures("sql_generation_cache")
+def test_cache_skips_invalid_and_errored_generations():
+    service = cache_service()
+    prompt = Prompt(text="Foo", db_connection_id="db-connection")
+    request = SQLGenerationRequest(use_cache=True)
+    service.cache_sql_generation(
+        prompt, request, SQLGeneration(prompt_id="prompt", sql="SELECT 1")
+    )
+    service.cache_sql_generation(
+        prompt,
+        request,
+        SQLGeneration(prompt_id="prompt", sql="SELECT 1", status="VALID", error="Foo"),
+    )
+    assert service.get_cached_sql_generation(prompt, request) is None
+
+
+def test_cache_entries_expire(monkeypatch, sql_generation_cache):
+    monkeypatch.setattr(sql_generation_cache, "ttl", -1)
+    sql_generation_cache.add(
+        "key", "db-connection", SQLGeneration(prompt_id="prompt", status="VALID")
+    )
+    assert sql_generation_cache.get("key") is None
+    assert "key" not in sql_generation_cache.sql_generations
+
+
+def test_cache_evicts_least_recently_used(monkeypatch, sql_generation_cache):
+    monkeypatch.setattr(sql_generation_cache, "max_size", 2)
+    for key in ["first", "second"]:
+        sql_generation_cache.add(
+            key, "db-connection", SQLGeneration(prompt_id=key, status="VALID")
+        )
+    sql_generation_cache.get("first")
+    sql_generation_cache.add(
+        "third", "db-connection", SQLGeneration(prompt_id="third", status="VALID")
+    )
+    assert sql_generation_cache.get("second") is None
+    assert sql_generation_cache.get("first").prompt_id == "first"
+    assert sql_generation_cache.get("third").prompt_id == "third"
+
+
+def test_cache_returns_copies(sql_generation_cache):
+    sql_generation = SQLGeneration(prompt_id="prompt", sql="SELECT 1", status="VALID")
+    sql_generation_cache.add("key", "db-connection", sql_generation)
+    sql_generation.sql = "SELECT 2"
+    cached_sql_generation = sql_generation_cache.get("key")
+    cached_sql_generation.sql = "SELECT 3"
+    assert sql_generation_cache.get("key").sql == "SELECT 1"
+
+
+def test_cache_invalidate_drops_db_connection_entries(sql_generation_cache):
+    for key, db_connection_id in [("first", "a"), ("second", "b"), ("third", "a")]:
+        sql_generation_cache.add(
+            key, db_connection_id, SQLGeneration(prompt_id=key, status="VALID")
+        )
+    sql_generation_cache.invalidate("a")
+    assert list(sql_generation_cache.sql_generations) == ["second"]
+
+
+@pytest.mark.usefixtures("sql_generation_cache")
+def test_cache_hit_keeps_finetuning_fields(monkeypatch):
+    service = cache_service()
+    service.sql_generation_repository = MagicMock()
+    service.sql_generation_repository.update.side_effect = lambda row: row
+    prompt = Prompt(id="prompt", text="Foo", db_connection_id="db-connection")
+    service.prompt_repository = MagicMock()
+    service.prompt_repository.find_by_id.return_value = prompt
+    service.db_connection_repository = MagicMock()
+    monkeypatch.setattr(sql_generations.SQLDatabase, "get_sql_engine", MagicMock())
+    monkeypatch.setattr(
+        service, "get_sql_generator", MagicMock(side_effect=AssertionError)
+    )
+    request = SQLGenerationRequest(
+        use_cache=True, finetuning_id="finetuning", low_latency_mode=True
+    )
+    service.cache_sql_generation(
+        prompt,
+        request,
+        SQLGeneration(prompt_id="prompt", sql="SELECT 1", status="VALID"),
+    )
+
+    sql_generation = service.create("prompt", request)
+    assert sql_generation.sql == "SELECT 1"
+    assert sql_generation.finetuning_id == "finetuning"
+    assert sql_generation.low_latency_mode is True
@@ -0,0 +1,106 @@
+from threading import Thread
+from unittest.mock import MagicMock
+
+import pytest
+
+from dataherald.sql_database import base
+from dataherald.sql_database.base import DBConnections, SQLDatabase
+from dataherald.sql_database.models.types import DatabaseConnection
+
+
+@pytest.fixture(autouse=True)
+def clear_db_connections():
+    DBConnections.db_connections.clear()
+    yield
+    DBConnections.db_connections.clear()
+
+
+def test_get_returns_cached_engine():
+    sql_database = MagicMock()
+    DBConnections.add("a", sql_database)
+    assert DBConnections.get("a") is sql_database
+    assert DBConnections.get("b") is None
+
+
+def test_refresh_replaces_without_disposing():
+    old_sql_database = MagicMock()
+    new_sql_database = MagicMock()
+    DBConnections.add("a", old_sql_database)
+    DBConnections.add("a", new_sql_database)
+    assert DBConnections.get("a") is new_sql_database
+    old_sql_database.engine.dispose.assert_not_called()
+
+
+def test_evicts_and_disposes_least_recently_used(monkeypatch):
+    monkeypatch.setattr(DBConnections, "max_size", 2)
+    first, second, third = MagicMock(), MagicMock(), MagicMock()
+    DBConnections.add("first", first)
+    DBConnections.add("second", second)
+    DBConnections.get("first")
+    DBConnections.add("third", third)
+    assert DBConnections.get("second") is None
+    assert DBConnections.get("first") is first
+    second.engine.dispose.assert_called_once()
+    first.engine.dispose.assert_not_called()
+
+
+def test_invalidate_disposes_engine():
+    sql_database = MagicMock()
+    DBConnections.add("a", sql_database)
+    DBConnections.invalidate("a")
+    DBConnections.invalidate("missing")
+    assert DBConnections.get("a") is None
+    sql_database.engine.dispose.assert_called_once()
+
+
+def test_concurrent_access(monkeypatch):
+    monkeypatch.setattr(DBConnections, "max_size", 4)
+    errors = []
+
+    def worker(offset: int):
+        try:
+            for i in range(500):
+                key = str((i + offset) % 8)
+                DBConnections.add(key, MagicMock())
+                DBConnections.get(key)
+                DBConnections.invalidate(str((i + offset + 3) % 8))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(DBConnections.db_connections) <= DBConnections.max_size
+
+
+def test_schema_engine_is_not_served_for_default_lookup(monkeypatch):
+    monkeypatch.setattr(
+        base, "FernetEncrypt", lambda: MagicMock(decrypt=lambda uri: uri)
+    )
+    monkeypatch.setattr(
+        SQLDatabase,
+        "from_uri",
+        classmethod(lambda cls, uri: MagicMock(uri=uri)),  # noqa: ARG005
+    )
+    database_connection = DatabaseConnection(
+        id="a", alias="a", connection_uri="postgresql://host/db?options=schema"
+    )
+    schema_sql_database = SQLDatabase.get_sql_engine(
+        database_connection, True, "schema"
+    )
+    database_connection.connection_uri = "postgresql://host/db"
+    sql_database = SQLDatabase.get_sql_engine(database_connection)
+    assert sql_database is not schema_sql_database
+    assert sql_database.uri == "postgresql://host/db"
+    assert SQLDatabase.get_sql_engine(database_connection) is sql_database
+    assert (
+        SQLDatabase.get_sql_engine(database_connection, schema="schema")
+        is schema_sql_database
+    )
+    DBConnections.invalidate("a")
+    assert DBConnections.db_connections == {}
+    schema_sql_database.engine.dispose.assert_called_once()
+    sql_database.engine.dispose.assert_called_once()
@@ -6,6 +6,7 @@ from dataherald.config import System
 from dataherald.sql_database.models.types import DatabaseConnection
 from dataherald.sql_generator import SQLGenerator
 from dataherald.types import Prompt, SQLGeneration
+from dataherald.utils.async_queue import StepQueue
 
 
 class TestGenerator(SQLGenerator):
@@ -21,7 +22,19 @@ class TestGenerator(SQLGenerator):
         metadata: dict = None,  # noqa: ARG002
     ) -> SQLGeneration:
         return SQLGeneration(
-            question_id="651f2d76275132d5b65175eb",
+            prompt_id="651f2d76275132d5b65175eb",
             sql="Foo response",
             status="bar",
         )
+
+    @override
+    def stream_response(
+        self,
+        user_prompt: Prompt,
+        database_connection: DatabaseConnection,
+        response: SQLGeneration,  # noqa: ARG002
+        queue: StepQueue,
+        metadata: dict = None,  # noqa: ARG002
+    ):
+        queue.put("Foo response")
+        queue.put(None)
@@ -0,0 +1,24 @@
+import asyncio
+from threading import Thread
+
+from dataherald.utils.async_queue import ThreadSafeAsyncQueue
+
+
+def test_items_put_from_a_worker_thread_arrive_in_order():
+    async def stream() -> list:
+        queue = ThreadSafeAsyncQueue()
+
+        def worker():
+            for index in range(100):
+                queue.put(index)
+            queue.put(None)
+
+        thread = Thread(target=worker)
+        thread.start()
+        items = []
+        while (item := await queue.get()) is not None:
+            items.append(item)
+        thread.join()
+        return items
+
+    assert asyncio.run(stream()) == list(range(100))
@@ -0,0 +1,23 @@
+import asyncio
+from typing import Any, Protocol
+
+
+class StepQueue(Protocol):
+    """Anything streamed SQL generation steps can be put into, a queue.Queue or a ThreadSafeAsyncQueue."""
+
+    def put(self, item: Any):
+        ...
+
+
+class ThreadSafeAsyncQueue:
+    """asyncio.Queue that worker threads can put into without blocking the event loop."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def put(self, item: Any):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    async def get(self) -> Any:
+        return await self.queue.get()
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from sql_metadata import Parser
 
 from dataherald.sql_database.models.types import DatabaseConnection
@@ -5,8 +7,13 @@ from dataherald.sql_database.services.database_connection import SchemaNotSuppor
 from dataherald.types import FineTuningRequest, GoldenSQL
 
 
+@lru_cache(maxsize=4096)
+def parse_tables(sql: str) -> tuple[str, ...]:
+    return tuple(Parser(sql).tables)
+
+
 def extract_the_schemas_from_sql(sql: str) -> list[str]:
-    table_names = Parser(sql).tables
+    table_names = parse_tables(sql)
     schemas = []
     for table_name in table_names:
         if "." in table_name:
@@ -18,16 +25,14 @@ def extract_the_schemas_from_sql(sql: str) -> list[str]:
 def filter_golden_records_based_on_schema(
     golden_sqls: list[GoldenSQL], schemas: list[str]
 ) -> list[GoldenSQL]:
-    filtered_records = []
     if not schemas:
         return golden_sqls
-    for record in golden_sqls:
-        used_schemas = extract_the_schemas_from_sql(record.sql)
-        for schema in schemas:
-            if schema in used_schemas:
-                filtered_records.append(record)
-                break
-    return filtered_records
+    schemas = set(schemas)
+    return [
+        record
+        for record in golden_sqls
+        if not schemas.isdisjoint(extract_the_schemas_from_sql(record.sql))
+    ]
 
 
 def validate_finetuning_schema(